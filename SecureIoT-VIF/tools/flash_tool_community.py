@@ -5,22 +5,108 @@ Version simplifiée pour l'apprentissage et l'éducation
 """
 
 import os
+import re
 import sys
 import subprocess
 import argparse
+import functools
 import json
+import threading
 from pathlib import Path
 import time
 
-def run_command(cmd, check=True):
-    """Exécute une commande et affiche le résultat"""
+# Descriptions de ports série typiques des cartes ESP32
+_ESP32_DESC_RE = re.compile(r"cp210|ch340|ftdi|silicon labs|esp32", re.IGNORECASE)
+
+# Configuration automatique Community (sdkconfig)
+_COMMUNITY_SDKCONFIG = (
+    # Configuration Community Edition (éducative)
+    ("CONFIG_SECURE_IOT_COMMUNITY_EDITION", "y"),
+    ("CONFIG_SECURE_IOT_BASIC_CRYPTO_ONLY", "y"),
+    ("CONFIG_SECURE_IOT_SECURITY_LEVEL", "2"),
+
+    # Configuration capteurs (DHT22 seulement)
+    ("CONFIG_SECURE_IOT_DHT22_GPIO", "4"),
+    ("CONFIG_SECURE_IOT_DHT22_POWER_GPIO", "5"),
+
+    # Intervalles Community (moins fréquents)
+    ("CONFIG_SECURE_IOT_INTEGRITY_CHECK_INTERVAL", "300"),
+    ("CONFIG_SECURE_IOT_SENSOR_READ_INTERVAL", "5"),
+
+    # Crypto Community (software seulement)
+    ("CONFIG_MBEDTLS_HARDWARE_AES", "n"),
+    ("CONFIG_MBEDTLS_HARDWARE_SHA", "n"),
+    ("CONFIG_MBEDTLS_ECDSA_C", "y"),
+    ("CONFIG_MBEDTLS_ECP_C", "y"),
+
+    # Configuration ESP32 Community (basique)
+    ("CONFIG_ESP32_DEFAULT_CPU_FREQ_160", "y"),
+    ("CONFIG_ESP32_ENABLE_COREDUMP", "n"),
+    ("CONFIG_ESP32_PANIC_HANDLER_REBOOT", "y"),
+
+    # Désactiver fonctionnalités Enterprise
+    ("CONFIG_SECURE_BOOT", "n"),
+    ("CONFIG_SECURE_FLASH_ENC_ENABLED", "n"),
+)
+
+@functools.lru_cache(maxsize=16)
+def _read_text(path):
+    """Lit un fichier texte une seule fois (contenu mis en cache)"""
+    try:
+        return Path(path).read_text()
+    except OSError:
+        return ""
+
+def _file_size(path):
+    """Taille d'un fichier, ou None s'il n'existe pas (un seul stat)"""
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return None
+
+def _needs_rebuild(binpath, src_dirs, extra_files=()):
+    """Indique si une source est plus récente que le binaire compilé"""
+    if not os.path.exists(binpath):
+        return True
+    bin_mtime = os.path.getmtime(binpath)
+    
+    for path in extra_files:
+        if os.path.exists(path) and os.path.getmtime(path) > bin_mtime:
+            return True
+    
+    for d in src_dirs:
+        for root, _, files in os.walk(d):
+            for f in files:
+                if (f.endswith(('.c', '.h', '.cpp')) or f == "CMakeLists.txt") and \
+                        os.path.getmtime(os.path.join(root, f)) > bin_mtime:
+                    return True
+    return False
+
+def run_command(cmd, check=True, interactive=False):
+    """Exécute une commande et affiche sa sortie au fil de l'eau"""
     print(f"🔧 Exécution: {cmd}")
-    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
     
-    if result.stdout:
-        print(result.stdout)
-    if result.stderr and result.returncode != 0:
-        print(f"❌ Erreur: {result.stderr}")
+    if interactive:
+        # Commandes interactives (monitor): entrées/sorties du terminal parent
+        result = subprocess.run(cmd, shell=True)
+    else:
+        proc = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                text=True, bufsize=1)
+        
+        # stderr lu en parallèle pour éviter un blocage si son tube se remplit
+        stderr_lines = []
+        stderr_thread = threading.Thread(target=lambda: stderr_lines.extend(proc.stderr), daemon=True)
+        stderr_thread.start()
+        
+        for line in proc.stdout:
+            sys.stdout.write(line)
+        proc.wait()
+        stderr_thread.join()
+        
+        result = subprocess.CompletedProcess(cmd, proc.returncode, stderr="".join(stderr_lines))
+        
+        if result.stderr and result.returncode != 0:
+            print(f"❌ Erreur: {result.stderr}")
     
     if check and result.returncode != 0:
         sys.exit(1)
@@ -42,57 +128,24 @@ def check_environment():
     
     # Vérifier version SecureIoT-VIF Community
     if os.path.exists("main/app_config.h"):
-        with open("main/app_config.h", "r") as f:
-            content = f.read()
-            if "1.0.0-COMMUNITY" in content:
-                print("✅ SecureIoT-VIF Community Edition détectée")
-            elif "2.0.0-ESP32-CRYPTO" in content:
-                print("⚠️ SecureIoT-VIF Enterprise détectée - Utilisez l'outil Enterprise")
-                print("💡 Vous êtes dans le mauvais répertoire pour Community")
-            else:
-                print("❓ Version SecureIoT-VIF non identifiée")
+        content = _read_text("main/app_config.h")
+        if "1.0.0-COMMUNITY" in content:
+            print("✅ SecureIoT-VIF Community Edition détectée")
+        elif "2.0.0-ESP32-CRYPTO" in content:
+            print("⚠️ SecureIoT-VIF Enterprise détectée - Utilisez l'outil Enterprise")
+            print("💡 Vous êtes dans le mauvais répertoire pour Community")
+        else:
+            print("❓ Version SecureIoT-VIF non identifiée")
 
 def configure_project(args):
     """Configure le projet Community avec optimisations éducatives"""
     print("⚙️ Configuration SecureIoT-VIF Community Edition...")
     
     if args.auto_config:
-        # Configuration automatique Community
-        config = {
-            # Configuration Community Edition (éducative)
-            "CONFIG_SECURE_IOT_COMMUNITY_EDITION": "y",
-            "CONFIG_SECURE_IOT_BASIC_CRYPTO_ONLY": "y",
-            "CONFIG_SECURE_IOT_SECURITY_LEVEL": "2",
-            
-            # Configuration capteurs (DHT22 seulement)
-            "CONFIG_SECURE_IOT_DHT22_GPIO": "4",
-            "CONFIG_SECURE_IOT_DHT22_POWER_GPIO": "5",
-            
-            # Intervalles Community (moins fréquents)
-            "CONFIG_SECURE_IOT_INTEGRITY_CHECK_INTERVAL": "300",
-            "CONFIG_SECURE_IOT_SENSOR_READ_INTERVAL": "5",
-            
-            # Crypto Community (software seulement)
-            "CONFIG_MBEDTLS_HARDWARE_AES": "n",
-            "CONFIG_MBEDTLS_HARDWARE_SHA": "n", 
-            "CONFIG_MBEDTLS_ECDSA_C": "y",
-            "CONFIG_MBEDTLS_ECP_C": "y",
-            
-            # Configuration ESP32 Community (basique)
-            "CONFIG_ESP32_DEFAULT_CPU_FREQ_160": "y",
-            "CONFIG_ESP32_ENABLE_COREDUMP": "n",
-            "CONFIG_ESP32_PANIC_HANDLER_REBOOT": "y",
-            
-            # Désactiver fonctionnalités Enterprise
-            "CONFIG_SECURE_BOOT": "n",
-            "CONFIG_SECURE_FLASH_ENC_ENABLED": "n"
-        }
-        
         # Écrire la configuration Community
         print("📝 Application configuration Community...")
-        with open("sdkconfig", "w") as f:
-            for key, value in config.items():
-                f.write(f"{key}={value}\n")
+        Path("sdkconfig").write_text("".join(f"{key}={value}\n" for key, value in _COMMUNITY_SDKCONFIG))
+        _read_text.cache_clear()  # sdkconfig vient d'être réécrit
         
         print("✅ Configuration Community appliquée")
         
@@ -108,7 +161,7 @@ def configure_project(args):
     else:
         # Configuration interactive
         print("🔧 Lancement configuration interactive...")
-        run_command("idf.py menuconfig")
+        run_command("idf.py menuconfig", interactive=True)
 
 def build_project():
     """Compile le projet Community avec optimisations éducatives"""
@@ -121,18 +174,18 @@ def build_project():
     print(f"✅ Compilation terminée en {build_time:.1f}s")
     
     # Afficher les informations de build Community
-    if os.path.exists("build/bootloader/bootloader.bin"):
+    bootloader_size = _file_size("build/bootloader/bootloader.bin")
+    if bootloader_size is not None:
         print("📊 Taille des binaires Community:")
         
         # Taille bootloader
-        bootloader_size = os.path.getsize("build/bootloader/bootloader.bin")
         print(f"  📦 Bootloader: {bootloader_size:,} bytes")
         
         # Taille application
         app_files = ["build/SecureIoT-VIF-Community.bin"]
         for app_file in app_files:
-            if os.path.exists(app_file):
-                app_size = os.path.getsize(app_file)
+            app_size = _file_size(app_file)
+            if app_size is not None:
                 print(f"  📦 Application: {app_size:,} bytes")
                 
         print("💡 Optimisations Community:")
@@ -170,7 +223,7 @@ def monitor_project(port):
     print("  ✅ 'Community Edition Opérationnel'")
     print("\n💡 Appuyez sur Ctrl+] pour quitter")
     
-    run_command(f"idf.py -p {port} monitor")
+    run_command(f"idf.py -p {port} monitor", interactive=True)
 
 def detect_port():
     """Détecte automatiquement le port série ESP32"""
@@ -180,11 +233,7 @@ def detect_port():
         ports = list(serial.tools.list_ports.comports())
         
         # Rechercher spécifiquement ESP32
-        esp32_ports = []
-        for p in ports:
-            desc_lower = p.description.lower()
-            if any(keyword in desc_lower for keyword in ['cp210', 'ch340', 'ftdi', 'silicon labs', 'esp32']):
-                esp32_ports.append(p.device)
+        esp32_ports = [p.device for p in ports if _ESP32_DESC_RE.search(p.description or "")]
         
         if esp32_ports:
             selected_port = esp32_ports[0]
@@ -209,17 +258,20 @@ def run_tests():
     
     # Tests de compilation Community
     print("📋 Test compilation Community...")
-    start_time = time.time()
-    run_command("idf.py build")
-    build_time = time.time() - start_time
-    print(f"✅ Compilation réussie en {build_time:.1f}s")
+    if _needs_rebuild("build/SecureIoT-VIF-Community.bin", ["main", "components"],
+                      extra_files=["CMakeLists.txt", "sdkconfig"]):
+        start_time = time.time()
+        run_command("idf.py build")
+        build_time = time.time() - start_time
+        print(f"✅ Compilation réussie en {build_time:.1f}s")
+    else:
+        print("✅ Binaire Community à jour, compilation ignorée")
     
     # Tests de configuration Community
     print("📋 Test configuration Community...")
     if os.path.exists("sdkconfig"):
-        with open("sdkconfig", "r") as f:
-            config = f.read()
-            
+        config = _read_text("sdkconfig")
+        
         # Vérifier les configurations Community clés
         community_configs = [
             "CONFIG_SECURE_IOT_COMMUNITY_EDITION=y",
@@ -276,6 +328,7 @@ def clean_project():
         if os.path.exists(f):
             os.remove(f)
             print(f"🗑️ Supprimé: {f}")
+    _read_text.cache_clear()
     
     print("✅ Nettoyage Community terminé")
 
@@ -286,12 +339,11 @@ def show_version_info():
     # Détection version
     version = "Non détectée"
     if os.path.exists("main/app_config.h"):
-        with open("main/app_config.h", "r") as f:
-            content = f.read()
-            if "1.0.0-COMMUNITY" in content:
-                version = "v1.0.0 - Community Edition 🎓"
-            elif "2.0.0-ESP32-CRYPTO" in content:
-                version = "v2.0.0 - Enterprise Edition (Mauvais outil)"
+        content = _read_text("main/app_config.h")
+        if "1.0.0-COMMUNITY" in content:
+            version = "v1.0.0 - Community Edition 🎓"
+        elif "2.0.0-ESP32-CRYPTO" in content:
+            version = "v2.0.0 - Enterprise Edition (Mauvais outil)"
     
     print(f"Version: {version}")
     